@@ -1,19 +1,44 @@
 import discord
 from discord.ext import commands, tasks
 import asyncio
+import concurrent.futures
+import itertools
 import logging
 from typing import Optional
 import os
+import time
 from datetime import datetime
 
 from config import Config
 from shop_monitor import ShopMonitor
-from image_recognition import ImageRecognition
-from utils import format_duration, get_timestamp
+from image_recognition import DetectionResult, ImageRecognition
+from utils import TIMESTAMP_FORMAT, format_duration
+
+# Discord rejects uploads above 8MB
+UPLOAD_SIZE_LIMIT = 8000000
+
+def _stat_ok(path: Optional[str], limit: int = UPLOAD_SIZE_LIMIT) -> bool:
+    """Check that a file exists and is small enough to upload, with a single stat call"""
+    if not path:
+        return False
+    try:
+        return os.stat(path).st_size < limit
+    except OSError:
+        return False
 
 class IceButterflyBot(commands.Bot):
     """Discord bot for monitoring Ice Butterfly in taming.io shop"""
     
+    # commands.Bot keeps its own __dict__; slots still give our per-tick attributes descriptor access
+    __slots__ = (
+        'logger', 'image_recognition', 'monitor',
+        'monitoring_active', 'start_time', '_start_monotonic',
+        'checks_performed', '_check_counter', 'last_status_update',
+        '_target_channel', '_webhook', '_worker_executor',
+        '_status_embed_proto', '_success_embed_proto', '_error_embed_proto',
+        'monitoring_task', 'status_update_task',
+    )
+    
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
@@ -21,17 +46,42 @@ class IceButterflyBot(commands.Bot):
         super().__init__(command_prefix="!", intents=intents)
         
         self.logger = logging.getLogger("discord_bot")
-        self.monitor = ShopMonitor(self.logger)
         self.image_recognition = ImageRecognition(
             Config.REFERENCE_IMAGE_PATH, 
             Config.MATCH_THRESHOLD, 
             self.logger
         )
+        self.monitor = ShopMonitor(self.logger, self.image_recognition)
         
         self.monitoring_active = False
         self.start_time = None
+        self._start_monotonic = None
         self.checks_performed = 0
+        self._check_counter = itertools.count(1)
         self.last_status_update = None
+        self._target_channel = None
+        self._webhook = None
+        
+        # One worker so browser steps and detections never overlap; the driver is not thread safe
+        self._worker_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="monitor"
+        )
+        
+        # Embed skeletons that only need their dynamic parts filled in per send
+        self._status_embed_proto = discord.Embed(
+            title="📊 Monitoring Status Update",
+            color=discord.Color.blue()
+        )
+        self._status_embed_proto.add_field(name="⏱️ Running Duration", value="-", inline=True)
+        self._status_embed_proto.add_field(name="🔍 Checks Performed", value="-", inline=True)
+        self._status_embed_proto.add_field(name="🤖 Status", value="Monitoring Active", inline=True)
+        
+        self._success_embed_proto = discord.Embed(title="✅ Success", color=discord.Color.green())
+        self._error_embed_proto = discord.Embed(title="❌ Error", color=discord.Color.red())
+        
+        # Build the loops here rather than with decorators so intervals come from the loaded config
+        self.monitoring_task = tasks.loop(seconds=Config.MONITORING_INTERVAL)(self._monitoring_task_body)
+        self.status_update_task = tasks.loop(seconds=Config.STATUS_UPDATE_INTERVAL)(self._status_update_task_body)
         
         # Add commands
         self.add_commands()
@@ -77,7 +127,7 @@ class IceButterflyBot(commands.Bot):
             self.monitoring_task.cancel()
             self.status_update_task.cancel()
             
-            duration = format_duration(int((datetime.now() - self.start_time).total_seconds()))
+            duration = self._running_duration()
             
             embed = discord.Embed(
                 title="🛑 Ice Butterfly Monitor Stopped",
@@ -95,7 +145,7 @@ class IceButterflyBot(commands.Bot):
             await ctx.send(embed=embed)
             
             # Cleanup
-            self.monitor.cleanup()
+            await self.run_blocking(self.monitor.cleanup)
         
         @self.command(name="status")
         async def status(ctx):
@@ -112,8 +162,8 @@ class IceButterflyBot(commands.Bot):
                 inline=True
             )
             
-            if self.monitoring_active and self.start_time:
-                duration = format_duration(int((datetime.now() - self.start_time).total_seconds()))
+            if self.monitoring_active and self._start_monotonic is not None:
+                duration = self._running_duration()
                 embed.add_field(
                     name="⏱️ Running Duration",
                     value=duration,
@@ -147,29 +197,31 @@ class IceButterflyBot(commands.Bot):
             
             await ctx.send("📸 Taking test screenshot...")
             
-            screenshot_path = self.monitor.take_screenshot()
+            screenshot_path = await self.run_blocking(self.monitor.take_screenshot)
             if not screenshot_path:
                 await ctx.send("❌ Failed to take screenshot!")
                 return
             
             # Perform image recognition
-            found, confidence, position = self.image_recognition.detect_ice_butterfly(screenshot_path)
+            result = await self.run_blocking(
+                self.image_recognition.detect_ice_butterfly, screenshot_path
+            )
             
             embed = discord.Embed(
                 title="🔍 Image Recognition Test",
-                color=discord.Color.green() if found else discord.Color.orange(),
+                color=discord.Color.green() if result.found else discord.Color.orange(),
                 timestamp=datetime.now()
             )
             
             embed.add_field(
                 name="🎯 Detection Result",
-                value="Ice Butterfly Found!" if found else "Ice Butterfly Not Found",
+                value="Ice Butterfly Found!" if result.found else "Ice Butterfly Not Found",
                 inline=True
             )
             
             embed.add_field(
                 name="📊 Confidence",
-                value=f"{confidence:.3f}",
+                value=result.conf_str,
                 inline=True
             )
             
@@ -179,17 +231,17 @@ class IceButterflyBot(commands.Bot):
                 inline=True
             )
             
-            if position:
+            if result.position:
                 embed.add_field(
                     name="📍 Position",
-                    value=f"({position[0]}, {position[1]})",
+                    value=result.pos_str,
                     inline=True
                 )
             
             await ctx.send(embed=embed)
             
             # Send screenshot if small enough
-            if os.path.exists(screenshot_path) and os.path.getsize(screenshot_path) < 8000000:  # 8MB limit
+            if _stat_ok(screenshot_path):
                 try:
                     await ctx.send(file=discord.File(screenshot_path))
                 except Exception as e:
@@ -200,7 +252,7 @@ class IceButterflyBot(commands.Bot):
             """Restart the browser session"""
             await ctx.send("🔄 Restarting browser session...")
             
-            success = self.monitor.restart_session()
+            success = await self.run_blocking(self.monitor.restart_session)
             
             if success:
                 embed = discord.Embed(
@@ -223,139 +275,158 @@ class IceButterflyBot(commands.Bot):
         """Called when bot is ready"""
         self.logger.info(f"Bot logged in as {self.user}")
         
+        # Notifications go through the webhook when one is configured, reusing the client's HTTP session
+        if Config.DISCORD_WEBHOOK_URL and self._webhook is None:
+            self._webhook = discord.Webhook.from_url(Config.DISCORD_WEBHOOK_URL, client=self)
+        
         # Send startup message
-        for guild in self.guilds:
-            channel = discord.utils.get(guild.channels, name=Config.DISCORD_CHANNEL_NAME)
-            if channel and hasattr(channel, 'send'):
-                embed = discord.Embed(
-                    title="🤖 Ice Butterfly Monitor Online",
-                    description="Bot is ready to monitor taming.io shop!",
-                    color=discord.Color.blue(),
-                    timestamp=datetime.now()
-                )
-                
-                embed.add_field(
-                    name="🚀 Getting Started",
-                    value="Use `!start_monitoring` to begin monitoring",
-                    inline=False
-                )
-                
-                await channel.send(embed=embed)
-                break
+        channel = self._resolve_target_channel()
+        if channel:
+            embed = discord.Embed(
+                title="🤖 Ice Butterfly Monitor Online",
+                description="Bot is ready to monitor taming.io shop!",
+                color=discord.Color.blue(),
+                timestamp=datetime.now()
+            )
+            
+            embed.add_field(
+                name="🚀 Getting Started",
+                value="Use `!start_monitoring` to begin monitoring",
+                inline=False
+            )
+            
+            await channel.send(embed=embed)
+    
+    async def on_guild_join(self, guild: discord.Guild):
+        """Forget the cached channel when guild membership changes"""
+        self._target_channel = None
+    
+    async def on_guild_remove(self, guild: discord.Guild):
+        """Forget the cached channel when guild membership changes"""
+        self._target_channel = None
+    
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        """Forget the cached channel if it was deleted"""
+        if self._target_channel is not None and channel.id == self._target_channel.id:
+            self._target_channel = None
+    
+    def _resolve_target_channel(self):
+        """Find the notification channel once and cache it for later sends"""
+        if self._target_channel is None:
+            for guild in self.guilds:
+                channel = discord.utils.get(guild.channels, name=Config.DISCORD_CHANNEL_NAME)
+                if channel and hasattr(channel, 'send'):
+                    self._target_channel = channel
+                    break
+        
+        return self._target_channel
     
-    @tasks.loop(seconds=Config.MONITORING_INTERVAL)
-    async def monitoring_task(self):
+    async def _monitoring_task_body(self):
         """Main monitoring task"""
         try:
             if not self.monitoring_active:
                 self.monitoring_active = True
                 self.start_time = datetime.now()
+                self._start_monotonic = time.monotonic()
                 self.logger.info("Monitoring task started")
                 
                 # Initialize browser session
-                if not self.monitor.setup_driver():
+                if not await self.run_blocking(self.monitor.setup_driver):
                     await self.send_error_message("Failed to setup browser driver")
                     return
                 
-                if not self.monitor.navigate_to_game():
+                if not await self.run_blocking(self.monitor.navigate_to_game):
                     await self.send_error_message("Failed to navigate to taming.io")
                     return
                 
-                if not self.monitor.login_as_guest():
+                if not await self.run_blocking(self.monitor.login_as_guest):
                     await self.send_error_message("Failed to login as guest")
                     return
                 
-                if not self.monitor.access_shop():
+                if not await self.run_blocking(self.monitor.access_shop):
                     await self.send_error_message("Failed to access shop")
                     return
                 
                 await self.send_success_message("✅ Successfully connected to taming.io shop!")
             
-            # Monitor for Ice Butterfly using enhanced method
-            is_found = self.monitor.monitor_for_ice_butterfly()
-            
-            self.checks_performed += 1
-            
-            if is_found:
-                # Get screenshot and perform detailed analysis for confidence metrics
-                screenshot_path = self.monitor.last_screenshot_path
-                if screenshot_path:
-                    found, confidence, position = self.image_recognition.detect_ice_butterfly(screenshot_path)
-                    await self.send_butterfly_found_message(confidence, position, screenshot_path)
-                    self.monitoring_task.stop()
-                    self.monitoring_active = False
-                    self.logger.info("🦋 Ice Butterfly found! Monitoring stopped.")
-                else:
-                    await self.send_butterfly_found_message(0.9, (0, 0), None)
+            # Capture and analyze a single screenshot; the result carries the confidence metrics
+            result, screenshot_path = await self.run_blocking(
+                self.monitor.monitor_for_ice_butterfly
+            )
+            
+            self.checks_performed = next(self._check_counter)
+            
+            if result.found:
+                await self.send_butterfly_found_message(result, screenshot_path)
+                self.monitoring_task.stop()
+                self.monitoring_active = False
+                self.logger.info("🦋 Ice Butterfly found! Monitoring stopped.")
             else:
-                self.logger.debug(f"Check #{self.checks_performed}: Ice Butterfly not found in potion store")
+                self.logger.debug("Check #%d: Ice Butterfly not found in potion store", self.checks_performed)
         
         except Exception as e:
             self.logger.error(f"Error in monitoring task: {str(e)}")
             await self.send_error_message(f"Monitoring error: {str(e)}")
     
-    @tasks.loop(seconds=Config.STATUS_UPDATE_INTERVAL)
-    async def status_update_task(self):
+    async def _status_update_task_body(self):
         """Send periodic status updates"""
         try:
             if not self.monitoring_active:
                 return
             
-            duration = format_duration(int((datetime.now() - self.start_time).total_seconds()))
-            
-            embed = discord.Embed(
-                title="📊 Monitoring Status Update",
-                color=discord.Color.blue(),
-                timestamp=datetime.now()
-            )
+            duration = self._running_duration()
             
-            embed.add_field(
-                name="⏱️ Running Duration",
-                value=duration,
-                inline=True
-            )
-            
-            embed.add_field(
-                name="🔍 Checks Performed",
-                value=str(self.checks_performed),
-                inline=True
-            )
-            
-            embed.add_field(
-                name="🤖 Status",
-                value="Monitoring Active",
-                inline=True
-            )
+            embed = self._status_embed_proto.copy()
+            embed.timestamp = datetime.now()
+            embed.set_field_at(0, name="⏱️ Running Duration", value=duration, inline=True)
+            embed.set_field_at(1, name="🔍 Checks Performed", value=str(self.checks_performed), inline=True)
             
             await self.send_embed(embed)
             
         except Exception as e:
             self.logger.error(f"Error in status update task: {str(e)}")
     
-    async def send_butterfly_found_message(self, confidence: float, position: tuple, screenshot_path: str):
+    def _running_duration(self) -> str:
+        """Format how long monitoring has been running, using the monotonic clock"""
+        return format_duration(int(time.monotonic() - self._start_monotonic))
+    
+    async def run_blocking(self, call, *args):
+        """Run a blocking browser or detection call on the worker thread so the event loop stays responsive"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._worker_executor, call, *args)
+    
+    async def close(self):
+        """Shut down the monitor workers along with the bot"""
+        self._worker_executor.shutdown(wait=False)
+        self.monitor.close()
+        self.image_recognition.close()
+        await super().close()
+    
+    async def send_butterfly_found_message(self, result: DetectionResult, screenshot_path: Optional[str]):
         """Send Ice Butterfly found notification"""
+        now = datetime.now()
         embed = discord.Embed(
             title="🦋 ICE BUTTERFLY FOUND! 🦋",
             description="The Ice Butterfly has been detected in the shop!",
             color=discord.Color.gold(),
-            timestamp=datetime.now()
+            timestamp=now
         )
         
         embed.add_field(
             name="🎯 Confidence",
-            value=f"{confidence:.3f}",
+            value=result.conf_str,
             inline=True
         )
         
         embed.add_field(
             name="📍 Position",
-            value=f"({position[0]}, {position[1]})",
+            value=result.pos_str,
             inline=True
         )
         
         embed.add_field(
             name="⏰ Time",
-            value=get_timestamp(),
+            value=now.strftime(TIMESTAMP_FORMAT),
             inline=True
         )
         
@@ -368,42 +439,39 @@ class IceButterflyBot(commands.Bot):
         await self.send_embed(embed)
         
         # Send screenshot if available
-        if os.path.exists(screenshot_path) and os.path.getsize(screenshot_path) < 8000000:
+        if _stat_ok(screenshot_path):
             try:
-                for guild in self.guilds:
-                    channel = discord.utils.get(guild.channels, name=Config.DISCORD_CHANNEL_NAME)
-                    if channel and hasattr(channel, 'send'):
-                        await channel.send(file=discord.File(screenshot_path))
-                        break
+                channel = self._resolve_target_channel()
+                if channel:
+                    await channel.send(file=discord.File(screenshot_path))
             except Exception as e:
                 self.logger.error(f"Failed to send screenshot: {str(e)}")
     
     async def send_success_message(self, message: str):
         """Send success message to Discord"""
-        embed = discord.Embed(
-            title="✅ Success",
-            description=message,
-            color=discord.Color.green(),
-            timestamp=datetime.now()
-        )
+        embed = self._success_embed_proto.copy()
+        embed.description = message
+        embed.timestamp = datetime.now()
         
         await self.send_embed(embed)
     
     async def send_error_message(self, message: str):
         """Send error message to Discord"""
-        embed = discord.Embed(
-            title="❌ Error",
-            description=message,
-            color=discord.Color.red(),
-            timestamp=datetime.now()
-        )
+        embed = self._error_embed_proto.copy()
+        embed.description = message
+        embed.timestamp = datetime.now()
         
         await self.send_embed(embed)
     
     async def send_embed(self, embed: discord.Embed):
         """Send embed to Discord channel"""
-        for guild in self.guilds:
-            channel = discord.utils.get(guild.channels, name=Config.DISCORD_CHANNEL_NAME)
-            if channel and hasattr(channel, 'send'):
-                await channel.send(embed=embed)
-                break
+        if self._webhook:
+            try:
+                await self._webhook.send(embed=embed)
+                return
+            except discord.HTTPException as e:
+                self.logger.error(f"Failed to send via webhook, falling back to channel: {str(e)}")
+        
+        channel = self._resolve_target_channel()
+        if channel:
+            await channel.send(embed=embed)
@@ -1,9 +1,83 @@
-import cv2
-import numpy as np
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import hashlib
 import os
-from typing import Tuple, Optional
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List, Tuple, Optional
 import logging
 
+if TYPE_CHECKING:
+    import numpy as np
+
+# Coarse-to-fine search: match at up to 1/4 resolution first and only refine promising peaks.
+# Levels stop before the template drops below MIN_COARSE_SIZE, where coarse scores stop being reliable.
+# A frame with no coarse peak within COARSE_MARGIN of the threshold is a miss without any full-size match.
+PYRAMID_LEVELS = 2
+COARSE_MARGIN = 0.2
+MIN_COARSE_SIZE = 16
+COARSE_CANDIDATES = 5
+
+# Screenshots and the reference are halved before matching; references smaller than this stay full size
+DETECTION_SCALE = 0.5
+MIN_MATCH_SIZE = 16
+
+# Frames flatter than this (loading or blank screens) cannot contain the butterfly, so matching is skipped
+MIN_FRAME_STDDEV = 4.0
+
+# Recent frame digests and their results; an unchanged shop skips the matcher entirely
+RESULT_CACHE_SIZE = 32
+
+# Template scales tried by detect_multiple_scales
+MULTI_SCALES = (0.5, 0.75, 1.0, 1.25, 1.5)
+
+@dataclass
+class DetectionResult:
+    """Outcome of a detection, with display strings formatted once for every consumer"""
+    found: bool
+    confidence: float
+    position: Optional[Tuple[int, int]]
+    conf_str: str = field(init=False)
+    pos_str: str = field(init=False)
+    
+    def __post_init__(self):
+        self.conf_str = f"{self.confidence:.3f}"
+        self.pos_str = f"({self.position[0]}, {self.position[1]})" if self.position else "-"
+
+@functools.lru_cache(maxsize=None)
+def _get_cv2():
+    """Import OpenCV on first use so processes that never match images skip its load cost"""
+    import cv2
+    
+    # Let OpenCV's transparent API dispatch UMat work to a GPU when OpenCL is present
+    if cv2.ocl.haveOpenCL():
+        cv2.ocl.setUseOpenCL(True)
+    
+    return cv2
+
+@functools.lru_cache(maxsize=4)
+def _read_reference(path: str, mtime_ns: int) -> Optional[np.ndarray]:
+    """Decode a reference image once per file version; the mtime key drops stale entries on edit"""
+    cv2 = _get_cv2()
+    return cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+
+def decode_screenshot(png_bytes: bytes, grayscale: bool = False) -> Optional[np.ndarray]:
+    """Decode PNG bytes straight into a BGR (or grayscale) image without touching disk"""
+    import numpy as np
+    
+    cv2 = _get_cv2()
+    flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    return cv2.imdecode(np.frombuffer(png_bytes, np.uint8), flags)
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """Convert a BGR image to single channel; grayscale input is returned as-is"""
+    if image.ndim == 2:
+        return image
+    cv2 = _get_cv2()
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
 class ImageRecognition:
     """Handles image recognition for detecting Ice Butterfly in shop screenshots"""
     
@@ -12,116 +86,310 @@ class ImageRecognition:
         self.threshold = threshold
         self.logger = logger or logging.getLogger(__name__)
         self.reference_image = None
+        self.ref_shape = None
+        self._match_ref = None
+        self._match_scale = 1.0
+        self._ref_pyr: List[np.ndarray] = []
+        self._scaled_refs: List[Tuple[float, np.ndarray]] = []
+        self._ref_umat = None
+        self._result_cache: OrderedDict[bytes, DetectionResult] = OrderedDict()
+        
+        # matchTemplate releases the GIL, so threads can run the scales in parallel
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(len(MULTI_SCALES), os.cpu_count() or 1),
+            thread_name_prefix="multiscale"
+        )
         
         self._load_reference_image()
     
     def _load_reference_image(self) -> None:
         """Load the reference image for Ice Butterfly"""
         try:
-            if not os.path.exists(self.reference_image_path):
+            # One stat both checks the file exists and supplies the cache key's mtime
+            try:
+                mtime_ns = os.stat(self.reference_image_path).st_mtime_ns
+            except FileNotFoundError:
                 self.logger.error(f"Reference image not found: {self.reference_image_path}")
                 return
             
-            self.reference_image = cv2.imread(self.reference_image_path)
+            cv2 = _get_cv2()
+            
+            # Matching runs on a single channel, so decode the reference straight to grayscale
+            self.reference_image = _read_reference(self.reference_image_path, mtime_ns)
             if self.reference_image is None:
                 self.logger.error(f"Failed to load reference image: {self.reference_image_path}")
                 return
             
+            self.ref_shape = self.reference_image.shape
+            
+            # Downscaled reference used by detect_ice_butterfly_np
+            if min(self.ref_shape) * DETECTION_SCALE >= MIN_MATCH_SIZE:
+                self._match_scale = DETECTION_SCALE
+                self._match_ref = cv2.resize(
+                    self.reference_image, None, fx=DETECTION_SCALE, fy=DETECTION_SCALE,
+                    interpolation=cv2.INTER_AREA
+                )
+            else:
+                self._match_scale = 1.0
+                self._match_ref = self.reference_image
+            
+            # Gaussian pyramid of the reference; stop early if a level gets too small to match reliably
+            self._ref_pyr = [self._match_ref]
+            for _ in range(PYRAMID_LEVELS):
+                level = cv2.pyrDown(self._ref_pyr[-1])
+                if min(level.shape) < MIN_COARSE_SIZE:
+                    break
+                self._ref_pyr.append(level)
+            
+            # The reference never changes, so resize it for every scale exactly once
+            height, width = self.ref_shape
+            self._scaled_refs = [
+                (
+                    scale,
+                    cv2.resize(
+                        self.reference_image,
+                        (int(width * scale), int(height * scale)),
+                        interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+                    )
+                )
+                for scale in MULTI_SCALES
+                if int(width * scale) > 0 and int(height * scale) > 0
+            ]
+            
+            if cv2.ocl.useOpenCL():
+                try:
+                    self._ref_umat = cv2.UMat(self._match_ref)
+                except cv2.error as e:
+                    self.logger.warning(f"OpenCL unavailable for matching, using CPU: {str(e)}")
+                    self._ref_umat = None
+            
             self.logger.info(f"Reference image loaded successfully: {self.reference_image.shape}")
             
         except Exception as e:
             self.logger.error(f"Error loading reference image: {str(e)}")
     
-    def detect_ice_butterfly(self, screenshot_path: str) -> Tuple[bool, float, Optional[Tuple[int, int]]]:
+    def detect_ice_butterfly(self, screenshot_path: str) -> DetectionResult:
         """
-        Detect Ice Butterfly in the given screenshot
+        Detect Ice Butterfly in the screenshot stored at the given path
         
         Returns:
-            Tuple of (found, confidence, position)
+            DetectionResult with found, confidence and position
         """
         try:
-            if self.reference_image is None:
-                self.logger.warning("Reference image not loaded")
-                return False, 0.0, None
+            cv2 = _get_cv2()
             
             if not os.path.exists(screenshot_path):
                 self.logger.error(f"Screenshot not found: {screenshot_path}")
-                return False, 0.0, None
+                return DetectionResult(False, 0.0, None)
             
             # Load screenshot
-            screenshot = cv2.imread(screenshot_path)
+            screenshot = cv2.imread(screenshot_path, cv2.IMREAD_GRAYSCALE)
             if screenshot is None:
                 self.logger.error(f"Failed to load screenshot: {screenshot_path}")
-                return False, 0.0, None
+                return DetectionResult(False, 0.0, None)
+            
+        except Exception as e:
+            self.logger.error(f"Error during image recognition: {str(e)}")
+            return DetectionResult(False, 0.0, None)
+        
+        return self.detect_ice_butterfly_np(screenshot)
+    
+    def detect_ice_butterfly_np(self, screenshot: np.ndarray) -> DetectionResult:
+        """
+        Detect Ice Butterfly in an already decoded BGR or grayscale screenshot
+        
+        Returns:
+            DetectionResult with found, confidence and position
+        """
+        try:
+            if self.reference_image is None:
+                self.logger.warning("Reference image not loaded")
+                return DetectionResult(False, 0.0, None)
             
-            # Perform template matching
-            result = cv2.matchTemplate(screenshot, self.reference_image, cv2.TM_CCOEFF_NORMED)
+            cv2 = _get_cv2()
+            screenshot = to_grayscale(screenshot)
+            if self._match_scale != 1.0:
+                screenshot = cv2.resize(
+                    screenshot, None, fx=self._match_scale, fy=self._match_scale,
+                    interpolation=cv2.INTER_AREA
+                )
             
-            # Find the best match
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            # A visually identical shop gives the same answer, so reuse it
+            digest = hashlib.blake2b(screenshot.tobytes(), digest_size=16).digest()
+            cached = self._result_cache.get(digest)
+            if cached is not None:
+                self._result_cache.move_to_end(digest)
+                self.logger.debug("Reusing detection result for an unchanged frame")
+                return cached
             
-            # Check if match exceeds threshold
-            if max_val >= self.threshold:
-                self.logger.info(f"Ice Butterfly detected! Confidence: {max_val:.3f} at position {max_loc}")
-                return True, max_val, max_loc
-            else:
-                self.logger.debug(f"Ice Butterfly not found. Best match: {max_val:.3f} (threshold: {self.threshold})")
-                return False, max_val, max_loc
+            result = self._detect_scaled(screenshot)
+            self._result_cache[digest] = result
+            if len(self._result_cache) > RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+            return result
             
         except Exception as e:
             self.logger.error(f"Error during image recognition: {str(e)}")
-            return False, 0.0, None
+            return DetectionResult(False, 0.0, None)
+    
+    def _detect_scaled(self, screenshot: np.ndarray) -> DetectionResult:
+        """Run the coarse-to-fine match on a grayscale screenshot already at matching scale"""
+        # Errors propagate to detect_ice_butterfly_np so a failed match is never cached
+        cv2 = _get_cv2()
+        
+        # Mean/variance pre-pass: a near-uniform frame has nothing for the matcher to find
+        _, stddev = cv2.meanStdDev(screenshot)
+        if stddev[0, 0] < MIN_FRAME_STDDEV:
+            self.logger.debug("Skipping match on a flat frame (stddev %.2f)", stddev[0, 0])
+            return DetectionResult(False, 0.0, None)
+        
+        max_val, max_loc = -1.0, (0, 0)
+        levels = len(self._ref_pyr) - 1
+        coarse = screenshot
+        for _ in range(levels):
+            coarse = cv2.pyrDown(coarse)
+        
+        if levels > 0 and self._fits(self._ref_pyr[-1], coarse):
+            factor = 1 << levels
+            coarse_best, coarse_loc, peaks = self._coarse_peaks(coarse, self._ref_pyr[-1])
+            if not peaks:
+                # Nothing came close at coarse scale, which is every ordinary empty shop tick
+                max_val, max_loc = coarse_best, (coarse_loc[0] * factor, coarse_loc[1] * factor)
+            
+            # Refine every promising coarse peak, not just the strongest one
+            for _, peak_loc in peaks:
+                candidate = (peak_loc[0] * factor, peak_loc[1] * factor)
+                val, loc = self._match_region(screenshot, candidate)
+                if val > max_val:
+                    max_val, max_loc = val, loc
+                if max_val >= self.threshold:
+                    break
+        else:
+            # No coarse level fits this frame, so match at matching resolution directly
+            max_val, max_loc = self._match_reference(screenshot)
+        
+        max_loc = self._to_full_scale(max_loc)
+        
+        # Check if match exceeds threshold
+        if max_val >= self.threshold:
+            self.logger.info("Ice Butterfly detected! Confidence: %.3f at position %s", max_val, max_loc)
+            return DetectionResult(True, max_val, max_loc)
+        else:
+            self.logger.debug("Ice Butterfly not found. Best match: %.3f (threshold: %s)", max_val, self.threshold)
+            return DetectionResult(False, max_val, max_loc)
+    
+    def _to_full_scale(self, location: Tuple[int, int]) -> Tuple[int, int]:
+        """Map a location found on the downscaled screenshot back to screenshot pixels"""
+        if self._match_scale == 1.0:
+            return location
+        return int(location[0] / self._match_scale), int(location[1] / self._match_scale)
     
-    def detect_multiple_scales(self, screenshot_path: str) -> Tuple[bool, float, Optional[Tuple[int, int]]]:
+    @staticmethod
+    def _fits(template: Optional[np.ndarray], image: np.ndarray) -> bool:
+        """Check that a template is non-empty and no larger than the image"""
+        return (
+            template is not None and template.size > 0
+            and template.shape[0] <= image.shape[0] and template.shape[1] <= image.shape[1]
+        )
+    
+    @staticmethod
+    def _best_match(image, template) -> Tuple[float, Tuple[int, int]]:
+        """Run template matching and return the peak score and its (x, y) location in one pass"""
+        cv2 = _get_cv2()
+        result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+        if isinstance(result, cv2.UMat):
+            result = result.get()
+        
+        # argmax scans the response map once; minMaxLoc would also track the unused minimum
+        index = int(result.argmax())
+        return float(result.flat[index]), (index % result.shape[1], index // result.shape[1])
+    
+    def _coarse_peaks(
+        self, coarse: np.ndarray, template: np.ndarray
+    ) -> Tuple[float, Tuple[int, int], List[Tuple[float, Tuple[int, int]]]]:
+        """Return the best coarse score, its location and up to COARSE_CANDIDATES peaks above threshold - COARSE_MARGIN"""
+        cv2 = _get_cv2()
+        result = cv2.matchTemplate(coarse, template, cv2.TM_CCOEFF_NORMED)
+        floor = self.threshold - COARSE_MARGIN
+        height, width = template.shape
+        best_index = int(result.argmax())
+        best = (float(result.flat[best_index]), (best_index % result.shape[1], best_index // result.shape[1]))
+        
+        peaks = []
+        while len(peaks) < COARSE_CANDIDATES:
+            index = int(result.argmax())
+            value = float(result.flat[index])
+            if value < floor:
+                break
+            x, y = index % result.shape[1], index // result.shape[1]
+            peaks.append((value, (x, y)))
+            
+            # Non-max suppression: blank out the neighbourhood a template-sized match would overlap
+            result[max(0, y - height // 2):y + height // 2 + 1, max(0, x - width // 2):x + width // 2 + 1] = -1.0
+        
+        return best[0], best[1], peaks
+    
+    def _match_reference(self, screenshot: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+        """Match the full-size reference, on the OpenCL device when one is available"""
+        cv2 = _get_cv2()
+        if self._ref_umat is not None:
+            try:
+                return self._best_match(cv2.UMat(screenshot), self._ref_umat)
+            except cv2.error as e:
+                self.logger.warning(f"OpenCL matching failed, falling back to CPU: {str(e)}")
+                self._ref_umat = None
+        
+        return self._best_match(screenshot, self._match_ref)
+    
+    def _match_region(self, screenshot: np.ndarray, candidate: Tuple[int, int]) -> Tuple[float, Tuple[int, int]]:
+        """Re-match the matching-size reference in a window about twice its size around a coarse candidate"""
+        height, width = self._match_ref.shape
+        margin_x, margin_y = width // 2, height // 2
+        
+        x0 = max(0, candidate[0] - margin_x)
+        y0 = max(0, candidate[1] - margin_y)
+        x1 = min(screenshot.shape[1], candidate[0] + width + margin_x)
+        y1 = min(screenshot.shape[0], candidate[1] + height + margin_y)
+        
+        region = screenshot[y0:y1, x0:x1]
+        if not self._fits(self._match_ref, region):
+            return self._match_reference(screenshot)
+        
+        max_val, (x, y) = self._best_match(region, self._match_ref)
+        return max_val, (x0 + x, y0 + y)
+    
+    def detect_multiple_scales(self, screenshot_path: str) -> DetectionResult:
         """
         Detect Ice Butterfly using multiple scales for better accuracy
         """
         try:
             if self.reference_image is None or not os.path.exists(screenshot_path):
-                return False, 0.0, None
+                return DetectionResult(False, 0.0, None)
             
-            screenshot = cv2.imread(screenshot_path)
+            cv2 = _get_cv2()
+            screenshot = cv2.imread(screenshot_path, cv2.IMREAD_GRAYSCALE)
             if screenshot is None:
-                return False, 0.0, None
-            
-            best_confidence = 0.0
-            best_position = None
-            
-            # Try different scales
-            scales = [0.5, 0.75, 1.0, 1.25, 1.5]
-            
-            for scale in scales:
-                # Resize reference image
-                width = int(self.reference_image.shape[1] * scale)
-                height = int(self.reference_image.shape[0] * scale)
-                
-                if width <= 0 or height <= 0:
-                    continue
-                
-                resized_ref = cv2.resize(self.reference_image, (width, height))
-                
-                # Skip if resized image is larger than screenshot
-                if resized_ref.shape[0] > screenshot.shape[0] or resized_ref.shape[1] > screenshot.shape[1]:
-                    continue
-                
-                # Perform template matching
-                result = cv2.matchTemplate(screenshot, resized_ref, cv2.TM_CCOEFF_NORMED)
-                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                
-                if max_val > best_confidence:
-                    best_confidence = max_val
-                    best_position = max_loc
+                return DetectionResult(False, 0.0, None)
+            
+            # Skip references larger than the screenshot and match the rest concurrently
+            references = [ref for _, ref in self._scaled_refs if self._fits(ref, screenshot)]
+            matches = self._pool.map(lambda ref: self._best_match(screenshot, ref), references)
+            best_confidence, best_position = max(matches, key=lambda match: match[0], default=(0.0, None))
             
             if best_confidence >= self.threshold:
-                self.logger.info(f"Ice Butterfly detected (multi-scale)! Best confidence: {best_confidence:.3f}")
-                return True, best_confidence, best_position
+                self.logger.info("Ice Butterfly detected (multi-scale)! Best confidence: %.3f", best_confidence)
+                return DetectionResult(True, best_confidence, best_position)
             else:
-                self.logger.debug(f"Ice Butterfly not found (multi-scale). Best confidence: {best_confidence:.3f}")
-                return False, best_confidence, best_position
+                self.logger.debug("Ice Butterfly not found (multi-scale). Best confidence: %.3f", best_confidence)
+                return DetectionResult(False, best_confidence, best_position)
             
         except Exception as e:
             self.logger.error(f"Error during multi-scale detection: {str(e)}")
-            return False, 0.0, None
+            return DetectionResult(False, 0.0, None)
+    
+    def close(self) -> None:
+        """Release the multi-scale worker threads"""
+        self._pool.shutdown(wait=False)
     
     def create_detection_visualization(self, screenshot_path: str, position: Tuple[int, int], output_path: str) -> bool:
         """
@@ -131,6 +399,7 @@ class ImageRecognition:
             if not os.path.exists(screenshot_path) or self.reference_image is None:
                 return False
             
+            cv2 = _get_cv2()
             screenshot = cv2.imread(screenshot_path)
             if screenshot is None:
                 return False
@@ -138,8 +407,8 @@ class ImageRecognition:
             # Draw bounding box
             top_left = position
             bottom_right = (
-                top_left[0] + self.reference_image.shape[1],
-                top_left[1] + self.reference_image.shape[0]
+                top_left[0] + self.ref_shape[1],
+                top_left[1] + self.ref_shape[0]
             )
             
             cv2.rectangle(screenshot, top_left, bottom_right, (0, 255, 0), 2)
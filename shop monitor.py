@@ -1,7 +1,14 @@
+import base64
+import functools
 import os
-import time
+import queue
 import random
+import re
+import shutil
 import string
+import subprocess
+import threading
+import time
 from typing import Optional, Tuple
 import logging
 from selenium import webdriver
@@ -13,17 +20,362 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 import undetected_chromedriver as uc
 
 from config import Config
+from image_recognition import DetectionResult, ImageRecognition, decode_screenshot
 from utils import ensure_directory_exists, generate_screenshot_filename, retry_operation
 
+# Explicit waits poll for the element the next step needs instead of sleeping for the worst case
+POLL_FREQUENCY = 0.25
+PLAY_BUTTON_TIMEOUT = 8
+GUEST_BUTTON_TIMEOUT = 8
+POTIONS_BUTTON_TIMEOUT = 5
+ACCOUNT_FORM_TIMEOUT = 3
+
+# The shop pane is the readiness sentinel after clicking the shop button; the click is retried once
+SHOP_READY_TIMEOUT = 10
+SHOP_OPEN_ATTEMPTS = 2
+
+# Monitoring re-enters the potions section only after this long or when the page URL changes
+POTIONS_RENAV_INTERVAL = 300
+
+# How long closing the pool waits for the recycler to finish an in-flight launch or reset
+POOL_CLOSE_TIMEOUT = 30
+
+# Evaluates every selector in-page and returns [element, selector] for the first usable match,
+# so a whole selector group costs one WebDriver round-trip instead of one per selector
+FIND_FIRST_MATCH_JS = """
+const [xpaths, cssSelectors, visibleOnly] = arguments;
+const usable = (el) => {
+    if (!visibleOnly) return true;
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && !el.disabled
+        && getComputedStyle(el).visibility !== 'hidden';
+};
+for (const sel of xpaths) {
+    let found;
+    try {
+        found = document.evaluate(sel, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    } catch (err) {
+        continue;
+    }
+    for (let i = 0; i < found.snapshotLength; i++) {
+        if (usable(found.snapshotItem(i))) return [found.snapshotItem(i), sel];
+    }
+}
+for (const sel of cssSelectors) {
+    let found;
+    try {
+        found = document.querySelectorAll(sel);
+    } catch (err) {
+        continue;
+    }
+    for (const el of found) {
+        if (usable(el)) return [el, sel];
+    }
+}
+return null;
+"""
+
+# Selector groups for each button, built once and split by locator type
+# so each pass issues one kind of lookup.
+PLAY_XPATH = (
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'play')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'start')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'login')]",
+    "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'play')]",
+    "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'play')]",
+    "//input[@type='button' and contains(translate(@value, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'play')]",
+)
+PLAY_CSS = (
+    ".play-button, .play-btn, .start-button, .start-btn",
+    "#play-button, #play-btn, #start-button, #start-btn",
+    "[data-testid='play-button'], [data-testid='start-button']",
+    "button[class*='play'], button[class*='start']",
+    "a[class*='play'], a[class*='start']",
+)
+
+GUEST_XPATH = (
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'guest')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'anonymous')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'continue')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'skip')]",
+    "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'guest')]",
+    "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'guest')]",
+    "//input[@type='button' and contains(translate(@value, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'guest')]",
+)
+GUEST_CSS = (
+    ".guest-button, .guest-btn, .anonymous-button, .anonymous-btn",
+    "#guest-button, #guest-btn, #anonymous-button, #anonymous-btn",
+    "[data-testid='guest-button'], [data-testid='anonymous-button']",
+    "button[class*='guest'], button[class*='anonymous']",
+    "a[class*='guest'], a[class*='anonymous']",
+)
+
+USERNAME_XPATH = (
+    "//input[@type='text']",
+    "//input[@placeholder*='name']",
+    "//input[@placeholder*='Name']",
+    "//input[@placeholder*='username']",
+    "//input[@placeholder*='Username']",
+)
+USERNAME_CSS = (
+    "input[type='text']",
+    "input[placeholder*='name']",
+    ".username-input",
+    "#username",
+)
+
+CREATE_XPATH = (
+    "//button[contains(text(), 'Create')]",
+    "//button[contains(text(), 'Register')]",
+    "//button[contains(text(), 'Start')]",
+    "//button[contains(text(), 'Continue')]",
+    "//input[@type='submit']",
+)
+CREATE_CSS = (
+    ".create-button",
+    "#create-button",
+)
+
+SHOP_XPATH = (
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'shop')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'store')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'market')]",
+    "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'shop')]",
+    "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'store')]",
+    "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'shop')]",
+    "//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'shop')]",
+)
+SHOP_CSS = (
+    ".shop-button, .shop-btn, .store-button, .store-btn, .market-button, .market-btn",
+    "#shop-button, #shop-btn, #store-button, #store-btn, #market-button, #market-btn",
+    "[data-testid='shop-button'], [data-testid='store-button'], [data-testid='market-button']",
+    "button[class*='shop'], button[class*='store'], button[class*='market']",
+    "a[class*='shop'], a[class*='store'], a[class*='market']",
+    "div[class*='shop'], div[class*='store'], div[class*='market']",
+)
+
+# The open shop pane; screenshots are cropped to it when it can be found.
+# Only dialogs and item-holding containers qualify, so the shop button itself can never match.
+SHOP_PANEL_XPATH = ()
+SHOP_PANEL_CSS = (
+    "[role='dialog'][class*='shop'], [role='dialog'][class*='store'], [role='dialog'][class*='market']",
+    "[role='dialog'][id*='shop'], [role='dialog'][id*='store'], [role='dialog'][id*='market']",
+    "[aria-modal='true'][class*='shop'], [aria-modal='true'][class*='store'], [aria-modal='true'][class*='market']",
+    "div[class*='shop-container']:has(button, a), div[class*='shop-panel']:has(button, a), "
+    "div[class*='store-container']:has(button, a), div[class*='store-panel']:has(button, a)",
+)
+
+# Page-coordinate rectangle of an element, as Page.captureScreenshot expects for its clip,
+# plus the device pixel ratio that maps it onto screenshot pixels
+ELEMENT_CLIP_JS = """
+const r = arguments[0].getBoundingClientRect();
+return {x: r.left + window.scrollX, y: r.top + window.scrollY, width: r.width, height: r.height,
+        dpr: window.devicePixelRatio || 1};
+"""
+
+POTIONS_XPATH = (
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'potion')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'pet')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'animal')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'creature')]",
+    "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'butterfly')]",
+    "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'potion')]",
+    "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'pet')]",
+    "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'potion')]",
+    "//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'potion')]",
+)
+POTIONS_CSS = (
+    ".potion-button, .potion-btn, .pet-button, .pet-btn, .animal-button, .animal-btn",
+    "#potion-button, #potion-btn, #pet-button, #pet-btn, #animal-button, #animal-btn",
+    "[data-testid='potion-button'], [data-testid='pet-button'], [data-testid='animal-button']",
+    "button[class*='potion'], button[class*='pet'], button[class*='animal']",
+    "a[class*='potion'], a[class*='pet'], a[class*='animal']",
+    "div[class*='potion'], div[class*='pet'], div[class*='animal']",
+)
+
+# Chrome binaries to ask for a version, in the order undetected-chromedriver prefers them
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser")
+
+@functools.lru_cache(maxsize=None)
+def _chrome_major_version() -> Optional[int]:
+    """Detect the installed Chrome major version once instead of on every driver launch"""
+    for binary in CHROME_BINARIES:
+        path = shutil.which(binary)
+        if not path:
+            continue
+        try:
+            output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r"(\d+)\.", output)
+        if match:
+            return int(match.group(1))
+    
+    # Let undetected-chromedriver detect it itself
+    return None
+
+# undetected-chromedriver patches one shared chromedriver binary, so concurrent launches would race on it
+_LAUNCH_LOCK = threading.Lock()
+
+def _launch_driver(logger: logging.Logger):
+    """Launch a Chrome driver with undetected-chromedriver, falling back to the system chromedriver"""
+    with _LAUNCH_LOCK:
+        return _launch_driver_locked(logger)
+
+def _launch_driver_locked(logger: logging.Logger):
+    """Launch a Chrome driver; callers hold _LAUNCH_LOCK"""
+    # Use undetected-chromedriver for better Cloudflare bypass
+    chrome_options = Config.get_chrome_options()
+    
+    # Try to use undetected-chromedriver first
+    try:
+        driver = uc.Chrome(options=chrome_options, version_main=_chrome_major_version())
+        logger.info("Undetected Chrome driver initialized successfully")
+    except Exception as e:
+        logger.warning(f"Failed to initialize undetected Chrome driver: {str(e)}")
+        
+        # Fallback to regular Chrome driver
+        try:
+            service = Service('/usr/bin/chromedriver')
+            driver = webdriver.Chrome(service=service, options=chrome_options)
+            logger.info("Regular Chrome driver initialized successfully")
+        except Exception as e2:
+            logger.error(f"Failed to initialize regular Chrome driver: {str(e2)}")
+            return None
+    
+    # Set window size and timeouts; only explicit waits block, so a selector miss returns immediately
+    driver.set_window_size(1920, 1080)
+    driver.implicitly_wait(0)
+    driver.set_page_load_timeout(Config.BROWSER_TIMEOUT)
+    
+    return driver
+
+class BrowserPool:
+    """Keeps pre-launched Chrome drivers idle so a session restart does not pay the browser start-up cost"""
+    
+    def __init__(self, size: int, logger: Optional[logging.Logger] = None):
+        self.size = max(size, 0)
+        self.logger = logger or logging.getLogger(__name__)
+        self._idle = queue.Queue()
+        self._returned = queue.Queue()
+        self._closed = False
+        
+        # Nothing is launched until the first acquire; constructing a monitor stays cheap
+        self._recycler = None
+        self._recycler_lock = threading.Lock()
+    
+    def _ensure_recycler(self):
+        """Start the thread that launches and recycles drivers off the caller's thread, once"""
+        with self._recycler_lock:
+            if self._recycler is None and not self._closed:
+                self._recycler = threading.Thread(target=self._recycle_loop, name="browser-recycler", daemon=True)
+                self._recycler.start()
+    
+    def _fill(self):
+        """Launch drivers one at a time until the idle pool is back to full size"""
+        while not self._closed and self._idle.qsize() < self.size:
+            driver = _launch_driver(self.logger)
+            if driver is None:
+                return
+            if self._closed:
+                self._quit(driver)
+            else:
+                self._idle.put(driver)
+    
+    def _reset(self, driver) -> bool:
+        """Clear session state so a returned driver can be handed out again"""
+        try:
+            driver.delete_all_cookies()
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            self.logger.warning(f"Discarding unusable driver: {str(e)}")
+            return False
+    
+    def _recycle_loop(self):
+        """Reset returned drivers and replenish the idle pool"""
+        while True:
+            driver = self._returned.get()
+            if self._closed:
+                # Quit whatever was still waiting to be recycled
+                if driver is not None:
+                    self._quit(driver)
+                if self._returned.empty():
+                    break
+                continue
+            
+            if driver is not None:
+                # close() may have drained the idle pool while the driver was being reset
+                if self._idle.qsize() < self.size and self._reset(driver) and not self._closed:
+                    self._idle.put(driver)
+                else:
+                    self._quit(driver)
+            
+            self._fill()
+    
+    def _quit(self, driver):
+        """Quit a driver, ignoring errors from an already dead browser"""
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logger.warning(f"Error closing driver: {str(e)}")
+    
+    def acquire(self):
+        """Take an idle driver, launching one directly if none is ready"""
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            driver = _launch_driver(self.logger)
+        
+        # Ask the recycler to top the pool back up
+        self._ensure_recycler()
+        self._returned.put(None)
+        return driver
+    
+    def release(self, driver):
+        """Hand a driver back to be reset and reused"""
+        if driver is None:
+            return
+        if self._closed:
+            self._quit(driver)
+        else:
+            self._ensure_recycler()
+            self._returned.put(driver)
+    
+    def close(self):
+        """Stop the recycler, wait for it to finish its current driver and quit every idle driver"""
+        with self._recycler_lock:
+            self._closed = True
+            recycler = self._recycler
+        self._returned.put(None)
+        if recycler is not None:
+            recycler.join(POOL_CLOSE_TIMEOUT)
+            if recycler.is_alive():
+                self.logger.warning("Browser recycler did not stop in time")
+        
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
 class ShopMonitor:
     """Handles browser automation and shop monitoring for taming.io"""
     
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self, logger: Optional[logging.Logger] = None, image_recognition: Optional[ImageRecognition] = None,
+                 browser_pool: Optional[BrowserPool] = None):
         self.logger = logger or logging.getLogger(__name__)
+        self.image_recognition = image_recognition
+        self.browser_pool = browser_pool or BrowserPool(Config.BROWSER_POOL_SIZE, self.logger)
         self.driver = None
         self.is_logged_in = False
         self.shop_accessible = False
         self.last_screenshot_path = None
+        self.last_screenshot_np = None
+        self._shop_clip = None
+        self.in_potions = False
+        self._last_potions_nav = 0.0
+        self._potions_url = None
         
         # Create screenshots directory
         ensure_directory_exists("screenshots/")
@@ -32,34 +384,12 @@ class ShopMonitor:
         os.makedirs("screenshots", exist_ok=True)
     
     def setup_driver(self) -> bool:
-        """Setup Chrome driver with undetected-chromedriver"""
+        """Setup Chrome driver from the pre-warmed browser pool"""
         try:
             self.logger.info("Setting up Chrome driver...")
             
-            # Use undetected-chromedriver for better Cloudflare bypass
-            chrome_options = Config.get_chrome_options()
-            
-            # Try to use undetected-chromedriver first
-            try:
-                self.driver = uc.Chrome(options=chrome_options, version_main=None)
-                self.logger.info("Undetected Chrome driver initialized successfully")
-            except Exception as e:
-                self.logger.warning(f"Failed to initialize undetected Chrome driver: {str(e)}")
-                
-                # Fallback to regular Chrome driver
-                try:
-                    service = Service('/usr/bin/chromedriver')
-                    self.driver = webdriver.Chrome(service=service, options=chrome_options)
-                    self.logger.info("Regular Chrome driver initialized successfully")
-                except Exception as e2:
-                    self.logger.error(f"Failed to initialize regular Chrome driver: {str(e2)}")
-                    return False
-            
-            # Set window size and timeouts
-            self.driver.set_window_size(1920, 1080)
-            self.driver.implicitly_wait(Config.BROWSER_TIMEOUT)
-            
-            return True
+            self.driver = self.browser_pool.acquire()
+            return self.driver is not None
             
         except Exception as e:
             self.logger.error(f"Error setting up Chrome driver: {str(e)}")
@@ -92,107 +422,38 @@ class ShopMonitor:
             self.logger.info("Attempting to login as guest...")
             
             # Wait for page to fully load
-            time.sleep(8)
+            self._wait_for_page_ready()
             
             # Take initial screenshot for debugging
             self.driver.save_screenshot("screenshots/initial_page.png")
             
             # Look for play/login buttons with more comprehensive selectors
-            play_button_selectors = [
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'play')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'start')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'login')]",
-                "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'play')]",
-                "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'play')]",
-                "//input[@type='button' and contains(translate(@value, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'play')]",
-                ".play-button, .play-btn, .start-button, .start-btn",
-                "#play-button, #play-btn, #start-button, #start-btn",
-                "[data-testid='play-button'], [data-testid='start-button']",
-                "button[class*='play'], button[class*='start']",
-                "a[class*='play'], a[class*='start']"
-            ]
-            
-            play_button = None
-            for selector in play_button_selectors:
-                try:
-                    if selector.startswith("//"):
-                        elements = self.driver.find_elements(By.XPATH, selector)
-                    else:
-                        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    
-                    if elements:
-                        # Check if element is visible and clickable
-                        for element in elements:
-                            if element.is_displayed() and element.is_enabled():
-                                play_button = element
-                                self.logger.info(f"Found play button with selector: {selector}")
-                                break
-                        if play_button:
-                            break
-                except Exception as e:
-                    continue
+            play_button = self._wait_for_element(PLAY_XPATH, PLAY_CSS, "play button", PLAY_BUTTON_TIMEOUT)
             
             if play_button:
                 # Scroll to element and click
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", play_button)
-                time.sleep(2)
                 self.driver.execute_script("arguments[0].click();", play_button)
-                time.sleep(5)
                 self.logger.info("Clicked play button")
                 
                 # Take screenshot after clicking play
                 self.driver.save_screenshot("screenshots/after_play_click.png")
             
             # Look for guest login options with enhanced selectors
-            guest_button_selectors = [
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'guest')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'anonymous')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'continue')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'skip')]",
-                "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'guest')]",
-                "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'guest')]",
-                "//input[@type='button' and contains(translate(@value, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'guest')]",
-                ".guest-button, .guest-btn, .anonymous-button, .anonymous-btn",
-                "#guest-button, #guest-btn, #anonymous-button, #anonymous-btn",
-                "[data-testid='guest-button'], [data-testid='anonymous-button']",
-                "button[class*='guest'], button[class*='anonymous']",
-                "a[class*='guest'], a[class*='anonymous']"
-            ]
-            
-            guest_button = None
-            for selector in guest_button_selectors:
-                try:
-                    if selector.startswith("//"):
-                        elements = self.driver.find_elements(By.XPATH, selector)
-                    else:
-                        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    
-                    if elements:
-                        # Check if element is visible and clickable
-                        for element in elements:
-                            if element.is_displayed() and element.is_enabled():
-                                guest_button = element
-                                self.logger.info(f"Found guest button with selector: {selector}")
-                                break
-                        if guest_button:
-                            break
-                except Exception as e:
-                    continue
+            guest_button = self._wait_for_element(GUEST_XPATH, GUEST_CSS, "guest button", GUEST_BUTTON_TIMEOUT)
             
             if guest_button:
                 # Scroll to element and click
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", guest_button)
-                time.sleep(2)
                 self.driver.execute_script("arguments[0].click();", guest_button)
-                time.sleep(8)
                 self.logger.info("Clicked guest button")
                 
+                # Wait for any loading/transition
+                self._wait_for_page_ready()
+                
                 # Take screenshot after guest login
                 self.driver.save_screenshot("screenshots/after_guest_login.png")
                 
-                # Wait for any loading/transition
-                time.sleep(5)
-                
                 self.is_logged_in = True
                 return True
             
@@ -213,65 +474,22 @@ class ShopMonitor:
             username = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
             
             # Look for username input
-            username_selectors = [
-                "//input[@type='text']",
-                "//input[@placeholder*='name']",
-                "//input[@placeholder*='Name']",
-                "//input[@placeholder*='username']",
-                "//input[@placeholder*='Username']",
-                "input[type='text']",
-                "input[placeholder*='name']",
-                ".username-input",
-                "#username"
-            ]
-            
-            username_input = None
-            for selector in username_selectors:
-                try:
-                    if selector.startswith("//"):
-                        elements = self.driver.find_elements(By.XPATH, selector)
-                    else:
-                        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    
-                    if elements:
-                        username_input = elements[0]
-                        self.logger.info(f"Found username input with selector: {selector}")
-                        break
-                except Exception as e:
-                    continue
+            username_input = self._wait_for_element(
+                USERNAME_XPATH, USERNAME_CSS, "username input", ACCOUNT_FORM_TIMEOUT, visible_only=False
+            )
             
             if username_input:
                 username_input.clear()
                 username_input.send_keys(username)
-                time.sleep(2)
                 
                 # Look for create/register button
-                create_button_selectors = [
-                    "//button[contains(text(), 'Create')]",
-                    "//button[contains(text(), 'Register')]",
-                    "//button[contains(text(), 'Start')]",
-                    "//button[contains(text(), 'Continue')]",
-                    "//input[@type='submit']",
-                    ".create-button",
-                    "#create-button"
-                ]
-                
-                for selector in create_button_selectors:
-                    try:
-                        if selector.startswith("//"):
-                            elements = self.driver.find_elements(By.XPATH, selector)
-                        else:
-                            elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                        
-                        if elements:
-                            create_button = elements[0]
-                            self.driver.execute_script("arguments[0].click();", create_button)
-                            time.sleep(5)
-                            self.logger.info(f"Created account with username: {username}")
-                            self.is_logged_in = True
-                            return True
-                    except Exception as e:
-                        continue
+                create_button = self._find_element(CREATE_XPATH, CREATE_CSS, "create button", visible_only=False)
+                if create_button:
+                    self.driver.execute_script("arguments[0].click();", create_button)
+                    self._wait_for_page_ready()
+                    self.logger.info(f"Created account with username: {username}")
+                    self.is_logged_in = True
+                    return True
             
             self.logger.warning("Could not create random account")
             return False
@@ -285,68 +503,50 @@ class ShopMonitor:
         try:
             self.logger.info("Attempting to access shop...")
             
-            # Wait for game to load completely
-            time.sleep(15)
-            
-            # Take screenshot before accessing shop
-            self.driver.save_screenshot("screenshots/before_shop_access.png")
-            
-            # Look for shop/store buttons with enhanced selectors
-            shop_button_selectors = [
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'shop')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'store')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'market')]",
-                "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'shop')]",
-                "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'store')]",
-                "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'shop')]",
-                "//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'shop')]",
-                ".shop-button, .shop-btn, .store-button, .store-btn, .market-button, .market-btn",
-                "#shop-button, #shop-btn, #store-button, #store-btn, #market-button, #market-btn",
-                "[data-testid='shop-button'], [data-testid='store-button'], [data-testid='market-button']",
-                "button[class*='shop'], button[class*='store'], button[class*='market']",
-                "a[class*='shop'], a[class*='store'], a[class*='market']",
-                "div[class*='shop'], div[class*='store'], div[class*='market']"
-            ]
-            
-            shop_button = None
-            for selector in shop_button_selectors:
-                try:
-                    if selector.startswith("//"):
-                        elements = self.driver.find_elements(By.XPATH, selector)
-                    else:
-                        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    
-                    if elements:
-                        # Check if element is visible and clickable
-                        for element in elements:
-                            if element.is_displayed() and element.is_enabled():
-                                shop_button = element
-                                self.logger.info(f"Found shop button with selector: {selector}")
-                                break
-                        if shop_button:
-                            break
-                except Exception as e:
-                    continue
-            
-            if shop_button:
+            clicked = False
+            ready = False
+            for attempt in range(SHOP_OPEN_ATTEMPTS):
+                # The button toggles the shop, so a late-opening pane must not be clicked shut again
+                if clicked and self._find_element(SHOP_PANEL_XPATH, SHOP_PANEL_CSS, "shop panel"):
+                    ready = True
+                    break
+                
+                # Wait for the game to load far enough to show a shop/store button
+                shop_button = self._wait_for_element(SHOP_XPATH, SHOP_CSS, "shop button", Config.BROWSER_TIMEOUT)
+                
+                if attempt == 0:
+                    # Take screenshot before accessing shop
+                    self.driver.save_screenshot("screenshots/before_shop_access.png")
+                
+                if not shop_button:
+                    break
+                
                 # Scroll to element and click
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", shop_button)
-                time.sleep(3)
                 self.driver.execute_script("arguments[0].click();", shop_button)
-                time.sleep(8)
                 self.logger.info("Clicked shop button")
+                clicked = True
                 
+                if self._wait_for_element(SHOP_PANEL_XPATH, SHOP_PANEL_CSS, "shop panel", SHOP_READY_TIMEOUT):
+                    ready = True
+                    break
+                self.logger.warning("Shop did not signal readiness, retrying shop navigation...")
+            
+            if clicked:
                 # Take screenshot after accessing shop
                 self.driver.save_screenshot("screenshots/after_shop_access.png")
                 
                 # Now navigate to potions section
-                if self._navigate_to_potions_section():
-                    self.shop_accessible = True
-                    return True
-                else:
+                if not self._navigate_to_potions_section():
                     self.logger.warning("Could not navigate to potions section")
-                    self.shop_accessible = True  # Still consider shop accessible
-                    return True
+                
+                # Still consider shop accessible; crop to its pane only when the pane was recognized
+                if ready:
+                    self._refresh_shop_clip()
+                else:
+                    self._shop_clip = None
+                self.shop_accessible = True
+                return True
             
             self.logger.warning("Could not find shop button")
             return False
@@ -360,68 +560,98 @@ class ShopMonitor:
         try:
             self.logger.info("Attempting to navigate to potions section...")
             
-            # Wait for shop to load
-            time.sleep(5)
-            
-            # Look for potions/pets section buttons
-            potions_button_selectors = [
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'potion')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'pet')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'animal')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'creature')]",
-                "//button[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'butterfly')]",
-                "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'potion')]",
-                "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'pet')]",
-                "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'potion')]",
-                "//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'potion')]",
-                ".potion-button, .potion-btn, .pet-button, .pet-btn, .animal-button, .animal-btn",
-                "#potion-button, #potion-btn, #pet-button, #pet-btn, #animal-button, #animal-btn",
-                "[data-testid='potion-button'], [data-testid='pet-button'], [data-testid='animal-button']",
-                "button[class*='potion'], button[class*='pet'], button[class*='animal']",
-                "a[class*='potion'], a[class*='pet'], a[class*='animal']",
-                "div[class*='potion'], div[class*='pet'], div[class*='animal']"
-            ]
-            
-            potions_button = None
-            for selector in potions_button_selectors:
-                try:
-                    if selector.startswith("//"):
-                        elements = self.driver.find_elements(By.XPATH, selector)
-                    else:
-                        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    
-                    if elements:
-                        # Check if element is visible and clickable
-                        for element in elements:
-                            if element.is_displayed() and element.is_enabled():
-                                potions_button = element
-                                self.logger.info(f"Found potions button with selector: {selector}")
-                                break
-                        if potions_button:
-                            break
-                except Exception as e:
-                    continue
+            # Wait for shop to load and look for potions/pets section buttons
+            potions_button = self._wait_for_element(POTIONS_XPATH, POTIONS_CSS, "potions button", POTIONS_BUTTON_TIMEOUT)
             
             if potions_button:
                 # Scroll to element and click
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", potions_button)
-                time.sleep(3)
                 self.driver.execute_script("arguments[0].click();", potions_button)
-                time.sleep(8)
+                self._wait_for_page_ready()
                 self.logger.info("Clicked potions section button")
                 
                 # Take screenshot after accessing potions section
                 self.driver.save_screenshot("screenshots/after_potions_access.png")
-                
-                return True
             else:
                 self.logger.info("No specific potions section found, staying in main shop")
-                return True
+            
+            self.in_potions = True
+            self._last_potions_nav = time.monotonic()
+            self._potions_url = self.driver.current_url
+            return True
             
         except Exception as e:
             self.logger.error(f"Error navigating to potions section: {str(e)}")
             return False
     
+    def _refresh_shop_clip(self) -> None:
+        """Measure the shop pane again, keeping the clip only if the template still fits inside it"""
+        self._shop_clip = None
+        shop_panel = self._find_element(SHOP_PANEL_XPATH, SHOP_PANEL_CSS, "shop panel")
+        if not shop_panel:
+            return
+        
+        clip = self.driver.execute_script(ELEMENT_CLIP_JS, shop_panel)
+        if not clip:
+            return
+        dpr = clip.pop("dpr", 1) or 1
+        if clip["width"] <= 0 or clip["height"] <= 0:
+            self.logger.debug("Shop panel has no area, capturing the full page")
+            return
+        
+        ref_shape = self.image_recognition.ref_shape if self.image_recognition else None
+        if ref_shape is not None and (clip["height"] * dpr < ref_shape[0] or clip["width"] * dpr < ref_shape[1]):
+            self.logger.debug("Shop panel is smaller than the reference image, capturing the full page")
+            return
+        
+        self._shop_clip = clip
+    
+    def _needs_potions_nav(self) -> bool:
+        """Check whether the potions section has to be re-entered before the next capture"""
+        if not self.in_potions:
+            return True
+        if time.monotonic() - self._last_potions_nav > POTIONS_RENAV_INTERVAL:
+            return True
+        return self.driver.current_url != self._potions_url
+    
+    def _find_element(self, xpath_selectors, css_selectors, description: str, visible_only: bool = True):
+        """Return the first matching element, trying XPath selectors before CSS ones, in one script call"""
+        try:
+            match = self.driver.execute_script(
+                FIND_FIRST_MATCH_JS, list(xpath_selectors), list(css_selectors), visible_only
+            )
+        except Exception as e:
+            self.logger.warning("Error searching for %s: %s", description, e)
+            return None
+        
+        if not match:
+            return None
+        
+        element, selector = match
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Found %s with selector: %s", description, selector)
+        return element
+    
+    def _wait_for_element(self, xpath_selectors, css_selectors, description: str, timeout: float, visible_only: bool = True):
+        """Poll for a selector group until it matches, returning None once the timeout expires"""
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=POLL_FREQUENCY).until(
+                lambda driver: self._find_element(xpath_selectors, css_selectors, description, visible_only)
+            )
+        except TimeoutException:
+            return None
+    
+    def _wait_for_page_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the document has finished loading"""
+        try:
+            WebDriverWait(self.driver, timeout or Config.BROWSER_TIMEOUT, poll_frequency=POLL_FREQUENCY).until(
+                lambda driver: driver.execute_script("return document.readyState") == "complete"
+            )
+            return True
+        except TimeoutException:
+            self.logger.warning("Timeout waiting for page to finish loading")
+            return False
+    
     def take_screenshot(self) -> Optional[str]:
         """Take a screenshot of the current page"""
         try:
@@ -429,52 +659,87 @@ class ShopMonitor:
                 self.logger.error("Driver not initialized")
                 return None
             
-            screenshot_path = generate_screenshot_filename()
-            ensure_directory_exists(screenshot_path)
-            
-            # Take screenshot
-            self.driver.save_screenshot(screenshot_path)
-            self.last_screenshot_path = screenshot_path
-            
-            self.logger.debug(f"Screenshot saved to {screenshot_path}")
-            return screenshot_path
+            return self._save_screenshot(self.driver.get_screenshot_as_png())
             
         except Exception as e:
             self.logger.error(f"Error taking screenshot: {str(e)}")
             return None
     
-    def monitor_for_ice_butterfly(self) -> bool:
-        """Monitor the shop for Ice Butterfly with enhanced detection"""
+    def _save_screenshot(self, png_bytes: bytes) -> str:
+        """Write already captured PNG bytes to a new screenshot file"""
+        screenshot_path = generate_screenshot_filename()
+        ensure_directory_exists(screenshot_path)
+        
+        with open(screenshot_path, "wb") as f:
+            f.write(png_bytes)
+        self.last_screenshot_path = screenshot_path
+        
+        self.logger.debug("Screenshot saved to %s", screenshot_path)
+        return screenshot_path
+    
+    def _capture_shop_png(self) -> bytes:
+        """Capture the shop pane as PNG bytes in memory, falling back to the full page"""
+        if self._shop_clip is not None:
+            try:
+                # CDP returns only the clipped region instead of a base64 full frame over WebDriver
+                data = self.driver.execute_cdp_cmd("Page.captureScreenshot", {
+                    "format": "png",
+                    "clip": {**self._shop_clip, "scale": 1},
+                    "captureBeyondViewport": False,
+                })
+                return base64.b64decode(data["data"])
+            except WebDriverException as e:
+                # Stop cropping until the shop is re-entered
+                self.logger.debug("Shop panel capture failed, using full page: %s", e)
+                self._shop_clip = None
+        
+        return self.driver.get_screenshot_as_png()
+    
+    def monitor_for_ice_butterfly(self) -> Tuple[DetectionResult, Optional[str]]:
+        """
+        Monitor the shop for Ice Butterfly with enhanced detection
+        
+        Returns:
+            Tuple of (detection result, screenshot_path)
+        """
         try:
-            self.logger.info("Starting Ice Butterfly monitoring in potion store...")
+            if self.image_recognition is None:
+                self.logger.error("No image recognition configured for Ice Butterfly detection")
+                return DetectionResult(False, 0.0, None), None
             
-            # Ensure we're in the potion store section
-            if not self._navigate_to_potions_section():
-                self.logger.warning("Could not navigate to potions section, monitoring main shop instead")
+            self.logger.info("Starting Ice Butterfly monitoring in potion store...")
             
-            # Wait for page to load completely
-            time.sleep(5)
+            # Ensure we're in the potion store section; access_shop normally already put us there
+            if self._needs_potions_nav():
+                if not self._navigate_to_potions_section():
+                    self.logger.warning("Could not navigate to potions section, monitoring main shop instead")
+                
+                # Wait for page to load completely
+                self._wait_for_page_ready()
+                
+                # The pane may have moved or resized since it was last measured
+                self._refresh_shop_clip()
             
-            # Take screenshot for analysis
-            screenshot_path = self.take_screenshot()
-            if not screenshot_path:
-                self.logger.error("Failed to take screenshot for Ice Butterfly detection")
-                return False
+            # Capture the shop in memory; only a detection is written to disk
+            png_bytes = self._capture_shop_png()
+            self.last_screenshot_np = decode_screenshot(png_bytes, grayscale=True)
+            if self.last_screenshot_np is None:
+                self.logger.error("Failed to capture screenshot for Ice Butterfly detection")
+                return DetectionResult(False, 0.0, None), None
             
-            # Check if Ice Butterfly is present
-            from image_recognition import detect_ice_butterfly
-            is_found = detect_ice_butterfly(screenshot_path)
+            # Check if Ice Butterfly is present, reusing the already decoded screenshot
+            result = self.image_recognition.detect_ice_butterfly_np(self.last_screenshot_np)
             
-            if is_found:
+            if result.found:
                 self.logger.info("🦋 ICE BUTTERFLY DETECTED! 🦋")
-                return True
-            else:
-                self.logger.debug("Ice Butterfly not found in current screenshot")
-                return False
+                return result, self._save_screenshot(png_bytes)
+            
+            self.logger.debug("Ice Butterfly not found in current screenshot")
+            return result, None
                 
         except Exception as e:
             self.logger.error(f"Error monitoring for Ice Butterfly: {str(e)}")
-            return False
+            return DetectionResult(False, 0.0, None), None
     
     def get_shop_status(self) -> dict:
         """Get current shop status information"""
@@ -490,17 +755,15 @@ class ShopMonitor:
         try:
             self.logger.info("Restarting browser session...")
             
-            # Close current driver
-            if self.driver:
-                try:
-                    self.driver.quit()
-                except Exception as e:
-                    self.logger.warning(f"Error closing driver: {str(e)}")
+            # Return current driver to the pool for recycling
+            self.browser_pool.release(self.driver)
             
             # Reset state
             self.driver = None
+            self._shop_clip = None
             self.is_logged_in = False
             self.shop_accessible = False
+            self.in_potions = False
             
             # Setup new driver
             if not self.setup_driver():
@@ -527,8 +790,24 @@ class ShopMonitor:
         """Clean up resources"""
         try:
             if self.driver:
-                self.driver.quit()
+                self.browser_pool.release(self.driver)
                 self.driver = None
+                self._shop_clip = None
+                self.in_potions = False
             self.logger.info("Shop monitor cleaned up")
         except Exception as e:
             self.logger.error(f"Error during cleanup: {str(e)}")
+    
+    def close(self):
+        """Quit the active browser and shut down the browser pool"""
+        try:
+            # Quit directly; a released driver would be left to the recycler as the process exits
+            if self.driver:
+                self.driver.quit()
+        except Exception as e:
+            self.logger.error(f"Error closing driver: {str(e)}")
+        finally:
+            self.driver = None
+            self._shop_clip = None
+            self.in_potions = False
+        self.browser_pool.close()
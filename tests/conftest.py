@@ -0,0 +1,26 @@
+import sys
+import types
+
+# config.py and utils.py only ship inside "ALL FILES FOR  CODESPACE.txt"; stand in for the parts
+# web interface.py reads at import so it can be loaded from the tree as it is
+if "config" not in sys.modules:
+    config = types.ModuleType("config")
+    
+    class Config:
+        MONITORING_INTERVAL = 10
+        STATUS_UPDATE_INTERVAL = 600
+        MATCH_THRESHOLD = 0.8
+        HEADLESS_MODE = True
+        GAME_URL = "https://taming.io"
+        DISCORD_CHANNEL_NAME = "general"
+        WEB_HOST = "127.0.0.1"
+        WEB_PORT = 5000
+    
+    config.Config = Config
+    sys.modules["config"] = config
+
+if "utils" not in sys.modules:
+    utils = types.ModuleType("utils")
+    utils.get_timestamp = lambda: "2024-01-01 00:00:00"
+    utils.format_duration = lambda seconds: f"{int(seconds)}s"
+    sys.modules["utils"] = utils
@@ -0,0 +1,39 @@
+import importlib.util
+import logging
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_compress")
+
+_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web interface.py")
+_spec = importlib.util.spec_from_file_location("web_interface", _PATH)
+web_interface = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(web_interface)
+
+
+def test_logs_revalidate_with_compressed_etag():
+    """A client echoing the ETag of a gzip /api/logs response gets 304"""
+    for i in range(50):
+        web_interface._log_ring.emit(logging.makeLogRecord({"msg": f"shop check {i} finished"}))
+    client = web_interface.app.test_client()
+    
+    first = client.get('/api/logs', headers={'Accept-Encoding': 'gzip'})
+    assert first.status_code == 200
+    assert first.headers.get('Content-Encoding') == 'gzip'
+    etag = first.headers['ETag']
+    assert etag.endswith(':gzip"')
+    
+    second = client.get('/api/logs', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert second.status_code == 304
+
+
+def test_access_log_lines_stay_out_of_the_ring():
+    """Dashboard request logging neither changes the ring nor evicts bot lines"""
+    version = web_interface._log_ring.version
+    web_interface._log_ring.handle(logging.makeLogRecord({"name": "werkzeug", "msg": "GET /api/status 200"}))
+    assert web_interface._log_ring.version == version
+    
+    web_interface._log_ring.handle(logging.makeLogRecord({"name": "shop_monitor", "msg": "Clicked shop button"}))
+    assert web_interface._log_ring.version == version + 1
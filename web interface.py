@@ -1,25 +1,276 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, abort, render_template, jsonify, request, send_file
+import ctypes
+import ctypes.util
+import gzip
 import logging
+import mmap
 import os
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime
+from typing import Optional, Tuple
 import json
 
 from config import Config
 from utils import get_timestamp, format_duration
 
+try:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config as HypercornConfig
+except ImportError:  # Fall back to the threaded Flask server on its own thread
+    serve = None
+
+try:
+    import orjson
+    from flask.json.provider import JSONProvider
+except ImportError:  # Keep Flask's stdlib json provider
+    orjson = None
+
+try:
+    from flask_compress import Compress
+except ImportError:  # Responses go out uncompressed
+    Compress = None
+
+HYPERCORN_AVAILABLE = serve is not None
+
+# /api/logs maps the log file and walks back from the end, so only its last pages are read
+LOG_TAIL_LINES = 100
+
+# Tails keyed by (path, inode, size, mtime); an unchanged log is answered without touching its contents
+LOG_TAIL_CACHE_SIZE = 32
+_LOG_TAIL_CACHE: OrderedDict = OrderedDict()
+_log_tail_lock = threading.Lock()
+
 app = Flask(__name__)
 app.logger.setLevel(logging.INFO)
 
-# Global variables to store bot state
-bot_status = {
-    "active": False,
-    "start_time": None,
-    "checks_performed": 0,
-    "last_check": None,
-    "errors": [],
-    "ice_butterfly_found": False,
-    "last_screenshot": None
+if orjson is not None:
+    class OrjsonProvider(JSONProvider):
+        """JSON provider that encodes with orjson so every jsonify call serializes in C"""
+        
+        def dumps(self, obj, **kwargs) -> str:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+        
+        def response(self, *args, **kwargs):
+            # Hand orjson's bytes straight to the response instead of round-tripping through str
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(
+                orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS), mimetype="application/json"
+            )
+    
+    app.json = OrjsonProvider(app)
+
+if Compress is not None:
+    # Log and status payloads are repetitive text; the cheapest level already shrinks them several times
+    app.config['COMPRESS_MIMETYPES'] = ['application/json']
+    app.config['COMPRESS_LEVEL'] = 1
+    Compress(app)
+
+# Compress appends the coding to the ETag it sends (W/"tag:gzip"), and clients echo that form back
+_ETAG_ENCODING_SUFFIXES = ("", ":gzip", ":br", ":deflate")
+
+def _not_modified(etag: str) -> bool:
+    """Whether If-None-Match names etag, in its plain or content-coded form"""
+    if_none_match = request.if_none_match
+    return any(if_none_match.contains_weak(etag + suffix) for suffix in _ETAG_ENCODING_SUFFIXES)
+
+# Config is frozen for the life of the process, so its JSON is serialized once
+_CONFIG = {
+    "monitoring_interval": Config.MONITORING_INTERVAL,
+    "status_update_interval": Config.STATUS_UPDATE_INTERVAL,
+    "match_threshold": Config.MATCH_THRESHOLD,
+    "headless_mode": Config.HEADLESS_MODE,
+    "game_url": Config.GAME_URL,
+    "discord_channel": Config.DISCORD_CHANNEL_NAME
 }
+_CONFIG_JSON = json.dumps(_CONFIG, separators=(",", ":")).encode()
+_CONFIG_VERSION = f"{zlib.crc32(_CONFIG_JSON):08x}"
+_CONFIG_JSON_GZIP = gzip.compress(_CONFIG_JSON, compresslevel=9)
+
+# /health has a fixed shape; only the timestamp and active flag are spliced in per request
+_HEALTH_FMT = b'{"status":"healthy","timestamp":"%s","bot_active":%s}'
+
+def _lock_in_memory(*buffers: bytes) -> None:
+    """Pin small prebuilt response bodies in RAM so cold polls on a tight host never page them back in"""
+    if not sys.platform.startswith('linux'):
+        return
+    
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    except OSError:
+        return
+    
+    for buffer in buffers:
+        # c_char_p points at the bytes object's own storage, so nothing is copied
+        address = ctypes.cast(ctypes.c_char_p(buffer), ctypes.c_void_p)
+        if libc.mlock(address, ctypes.c_size_t(len(buffer))) != 0:
+            # Needs CAP_IPC_LOCK or RLIMIT_MEMLOCK headroom; pinning is only an optimisation
+            app.logger.debug("Could not lock response body in memory: %s", os.strerror(ctypes.get_errno()))
+            return
+
+_lock_in_memory(_CONFIG_JSON, _CONFIG_JSON_GZIP, _HEALTH_FMT)
+
+class RingBufferHandler(logging.Handler):
+    """Keep the most recent formatted log lines in memory so /api/logs can skip the disk"""
+    
+    def __init__(self, capacity: int = LOG_TAIL_LINES):
+        super().__init__()
+        self.lines = deque(maxlen=capacity)
+        self.version = 0
+    
+    def emit(self, record):
+        try:
+            self.lines.append(self.format(record))
+            self.version += 1
+        except Exception:
+            self.handleError(record)
+    
+    def snapshot(self) -> list:
+        """Copy the buffered lines; the handler lock keeps emit from mutating them mid-copy"""
+        with self.lock:
+            return list(self.lines)
+
+# Per-request access lines would push bot lines out of the ring and change it on every dashboard poll
+_RING_EXCLUDED_LOGGERS = ("werkzeug", "hypercorn.access")
+
+def _is_bot_record(record: logging.LogRecord) -> bool:
+    """Keep a record in the ring unless it comes from a web server access logger"""
+    return not any(
+        record.name == name or record.name.startswith(name + ".") for name in _RING_EXCLUDED_LOGGERS
+    )
+
+_log_ring = RingBufferHandler()
+_log_ring.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_log_ring.addFilter(_is_bot_record)
+
+def _install_log_ring():
+    """Attach the in-memory log buffer to the root logger once logging has been configured"""
+    root = logging.getLogger()
+    if _log_ring not in root.handlers:
+        root.addHandler(_log_ring)
+
+@dataclass(frozen=True, slots=True)
+class BotStatus:
+    """Immutable snapshot of the bot state; every update publishes a new instance"""
+    active: bool = False
+    start_time: Optional[datetime] = None
+    checks_performed: int = 0
+    last_check: Optional[str] = None
+    errors: Tuple[str, ...] = ()
+    ice_butterfly_found: bool = False
+    last_screenshot: Optional[str] = None
+    
+    def __post_init__(self):
+        # A list handed in by a caller would stay mutable behind the frozen snapshot
+        if not isinstance(self.errors, tuple):
+            object.__setattr__(self, 'errors', tuple(self.errors))
+
+# Current bot state; handlers read the single slot once, so a swap is never seen half-applied
+_STATUS = [BotStatus()]
+
+# (uptime seconds, formatted duration); dashboards poll faster than the text changes
+_duration_cache = (-1, "")
+
+# (source key, serialized body, etag) of the last /api/logs answer, reused until the log changes
+_last_logs_body = (None, b"", None)
+
+# (path, mtime_ns, checked_at, info) for /api/screenshot; the file is re-probed at most every TTL
+SCREENSHOT_STAT_TTL = 0.5
+_screenshot_cache = (None, None, 0.0, {"available": False, "path": None, "timestamp": None})
+
+def tail_lines(path: str, count: int = LOG_TAIL_LINES) -> list:
+    """Return the non-empty lines among the last count lines of a file, paging in only the end of it"""
+    # A raw descriptor skips the io object stack (and its isatty/seek probes) that open() sets up
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files cannot be mapped
+        return []
+    finally:
+        # The mapping stays valid after the descriptor is closed
+        os.close(fd)
+    
+    try:
+        # Step back over count newlines (plus the file's trailing one), then split the block in one call
+        start = mm.size()
+        for _ in range(count + 1):
+            start = mm.rfind(b"\n", 0, start)
+            if start < 0:
+                break
+        tail = mm[start + 1:].splitlines()[-count:]
+        
+        # One strip per line; only the retained lines are decoded
+        return [line.decode('utf-8', errors='replace') for line in filter(None, map(bytes.strip, tail))]
+    finally:
+        mm.close()
+
+def cached_tail_lines(path: str, st: Optional[os.stat_result] = None) -> list:
+    """Return tail_lines for a file, reusing the last result while the file is unchanged"""
+    st = st or os.stat(path)
+    key = (path, st.st_ino, st.st_size, st.st_mtime_ns)
+    
+    with _log_tail_lock:
+        lines = _LOG_TAIL_CACHE.get(key)
+        if lines is not None:
+            _LOG_TAIL_CACHE.move_to_end(key)
+            return lines
+    
+    lines = tail_lines(path)
+    
+    with _log_tail_lock:
+        _LOG_TAIL_CACHE[key] = lines
+        if len(_LOG_TAIL_CACHE) > LOG_TAIL_CACHE_SIZE:
+            _LOG_TAIL_CACHE.popitem(last=False)
+    
+    return lines
+
+def _file_etag(st: os.stat_result) -> str:
+    """Weak validator for a file that changes only by being rewritten or appended to"""
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+def _logs_response(key: tuple, build_logs, etag: Optional[str] = None) -> Response:
+    """
+    Return the /api/logs body for key, serializing it again only when the key changes
+    
+    Without an explicit etag, the validator is derived from the key's version and the body's checksum.
+    A matching If-None-Match is answered with 304 before any lines are built.
+    """
+    global _last_logs_body
+    cached_key, body, cached_etag = _last_logs_body
+    if etag is None and cached_key == key:
+        etag = cached_etag
+    
+    # An unchanged log needs no body; the dashboard keeps what it already has
+    if etag is not None and _not_modified(etag):
+        return Response(status=304)
+    
+    if cached_key != key:
+        body = app.json.dumps({"logs": build_logs()}).encode()
+        if etag is None:
+            etag = f"{key[1]:x}-{zlib.crc32(body):08x}"
+            if _not_modified(etag):
+                return Response(status=304)
+        _last_logs_body = (key, body, etag)
+    
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    return response
+
+def _format_uptime(start_time: datetime) -> str:
+    """Format the time since start_time, reformatting only when the whole second changes"""
+    global _duration_cache
+    seconds = int((datetime.now() - start_time).total_seconds())
+    if seconds != _duration_cache[0]:
+        _duration_cache = (seconds, format_duration(seconds))
+    return _duration_cache[1]
 
 @app.route('/')
 def index():
@@ -29,12 +280,11 @@ def index():
 @app.route('/api/status')
 def get_status():
     """Get current bot status"""
-    status = bot_status.copy()
+    snapshot = _STATUS[0]
+    status = asdict(snapshot)
     
-    if status["start_time"]:
-        status["duration"] = format_duration(
-            int((datetime.now() - status["start_time"]).total_seconds())
-        )
+    if snapshot.start_time:
+        status["duration"] = _format_uptime(snapshot.start_time)
     else:
         status["duration"] = "Not started"
     
@@ -45,69 +295,143 @@ def get_status():
 @app.route('/api/logs')
 def get_logs():
     """Get recent log entries"""
-    logs = []
+    # The bot logs in-process, so recent lines are normally already in memory
+    if _log_ring.version:
+        return _logs_response(("ring", _log_ring.version), _log_ring.snapshot)
     
     # Try to read from log file if it exists
     log_file = "bot.log"
-    if os.path.exists(log_file):
-        try:
-            with open(log_file, 'r') as f:
-                lines = f.readlines()
-                # Get last 100 lines
-                logs = [line.strip() for line in lines[-100:] if line.strip()]
-        except Exception as e:
-            logs = [f"Error reading log file: {str(e)}"]
-    else:
-        logs = ["No log file found"]
+    try:
+        st = os.stat(log_file)
+    except FileNotFoundError:
+        return jsonify({"logs": ["No log file found"]})
+    except OSError as e:
+        return jsonify({"logs": [f"Error reading log file: {str(e)}"]})
     
-    return jsonify({"logs": logs})
+    try:
+        # Get last 100 lines
+        return _logs_response(
+            ("file", st.st_mtime_ns, st.st_size), lambda: cached_tail_lines(log_file, st), _file_etag(st)
+        )
+    except Exception as e:
+        return jsonify({"logs": [f"Error reading log file: {str(e)}"]})
 
 @app.route('/api/config')
 def get_config():
     """Get current configuration"""
-    config = {
-        "monitoring_interval": Config.MONITORING_INTERVAL,
-        "status_update_interval": Config.STATUS_UPDATE_INTERVAL,
-        "match_threshold": Config.MATCH_THRESHOLD,
-        "headless_mode": Config.HEADLESS_MODE,
-        "game_url": Config.GAME_URL,
-        "discord_channel": Config.DISCORD_CHANNEL_NAME
-    }
+    if 'gzip' in request.accept_encodings and len(_CONFIG_JSON_GZIP) < len(_CONFIG_JSON):
+        # Compressed once at import; the set Content-Encoding keeps Compress from redoing it
+        return Response(
+            _CONFIG_JSON_GZIP, mimetype='application/json',
+            headers={'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+        )
+    return Response(_CONFIG_JSON, mimetype='application/json')
+
+def _screenshot_state() -> tuple:
+    """Return (path, mtime_ns, info) for the latest screenshot, probing the file at most once per TTL"""
+    global _screenshot_cache
+    last_screenshot = _STATUS[0].last_screenshot
+    cached_path, cached_mtime, checked_at, screenshot_info = _screenshot_cache
+    now = time.monotonic()
+    
+    if last_screenshot != cached_path or now - checked_at >= SCREENSHOT_STAT_TTL:
+        mtime = None
+        if last_screenshot:
+            try:
+                mtime = os.stat(last_screenshot).st_mtime_ns
+            except OSError:
+                pass
+        
+        # Keep the previous answer, timestamp included, while the same file is unchanged
+        if last_screenshot != cached_path or mtime != cached_mtime:
+            screenshot_info = {
+                "available": mtime is not None,
+                "path": last_screenshot if mtime is not None else None,
+                "timestamp": get_timestamp() if mtime is not None else None
+            }
+        _screenshot_cache = (last_screenshot, mtime, now, screenshot_info)
+        cached_path, cached_mtime = last_screenshot, mtime
     
-    return jsonify(config)
+    return cached_path, cached_mtime, screenshot_info
 
 @app.route('/api/screenshot')
 def get_screenshot():
     """Get latest screenshot info"""
-    screenshot_info = {
-        "available": False,
-        "path": None,
-        "timestamp": None
+    cached_path, cached_mtime, screenshot_info = _screenshot_state()
+    
+    if cached_mtime is None:
+        return jsonify(screenshot_info)
+    
+    # The info only changes with the file, so its path and mtime validate the response
+    etag = f"{zlib.crc32(cached_path.encode()):x}-{cached_mtime:x}"
+    if _not_modified(etag):
+        return Response(status=304)
+    
+    response = jsonify(screenshot_info)
+    response.set_etag(etag, weak=True)
+    return response
+
+@app.route('/api/snapshot')
+def get_snapshot():
+    """Health, screenshot info and (when the client's copy is stale) config in one poll"""
+    snapshot = {
+        "health": {
+            "status": "healthy",
+            "timestamp": get_timestamp(),
+            "bot_active": _STATUS[0].active
+        },
+        "screenshot": _screenshot_state()[2],
+        "config_version": _CONFIG_VERSION
     }
     
-    if bot_status["last_screenshot"] and os.path.exists(bot_status["last_screenshot"]):
-        screenshot_info["available"] = True
-        screenshot_info["path"] = bot_status["last_screenshot"]
-        screenshot_info["timestamp"] = get_timestamp()
+    # Clients echo the version they hold as ?cv=; config is only resent when it differs
+    if request.args.get('cv') != _CONFIG_VERSION:
+        snapshot["config"] = _CONFIG
     
-    return jsonify(screenshot_info)
+    return jsonify(snapshot)
+
+@app.route('/api/screenshot/raw')
+def get_screenshot_raw():
+    """Stream the latest screenshot itself, with conditional and range request support"""
+    last_screenshot = _STATUS[0].last_screenshot
+    if not last_screenshot:
+        abort(404)
+    
+    # Screenshot paths are relative to the bot's working directory, while send_file would resolve
+    # a relative path against the app root; pin it down once for both
+    last_screenshot = os.path.abspath(last_screenshot)
+    try:
+        mtime = os.stat(last_screenshot).st_mtime
+    except OSError:
+        abort(404)
+    
+    # send_file hands the open file to the server's file wrapper, which can use sendfile(2)
+    return send_file(last_screenshot, mimetype='image/png', conditional=True, last_modified=mtime)
 
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "timestamp": get_timestamp(),
-        "bot_active": bot_status["active"]
-    })
+    body = _HEALTH_FMT % (get_timestamp().encode(), b'true' if _STATUS[0].active else b'false')
+    return Response(body, mimetype='application/json')
 
 def update_bot_status(status_update: dict):
     """Update bot status from external source"""
-    bot_status.update(status_update)
+    _STATUS[0] = replace(_STATUS[0], **status_update)
 
 def run_web_interface():
-    """Run the web interface"""
-    app.run(host=Config.WEB_HOST, port=Config.WEB_PORT, debug=False)
+    """Run the web interface on the threaded Flask server, so dashboard polls do not queue behind each other"""
+    _install_log_ring()
+    app.run(host=Config.WEB_HOST, port=Config.WEB_PORT, debug=False, threaded=True)
+
+async def serve_web_interface(shutdown_trigger):
+    """Serve the web interface with hypercorn on the running event loop until shutdown_trigger returns"""
+    _install_log_ring()
+    hypercorn_config = HypercornConfig()
+    hypercorn_config.bind = [f"{Config.WEB_HOST}:{Config.WEB_PORT}"]
+    
+    # Hypercorn runs WSGI apps on its own executor threads, so slow requests do not queue behind each other.
+    # An explicit trigger also stops it installing SIGINT/SIGTERM handlers that would outlive only the web task.
+    await serve(app, hypercorn_config, shutdown_trigger=shutdown_trigger)
 
 if __name__ == "__main__":
     run_web_interface()